@@ -1,16 +1,25 @@
 from __future__ import annotations
 
+import calendar
+import functools
+import glob
+import hashlib
+import io
 import os
 import re
-from datetime import datetime, timedelta, date
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone, date
+from zoneinfo import ZoneInfo
 
 import pandas as pd
-import pytz
-from dateutil.relativedelta import relativedelta
-from icalendar import Calendar, Event
+from icalendar import Event
 
 # 时区
-TZ = pytz.timezone("Asia/Shanghai")
+TZ = ZoneInfo("Asia/Shanghai")
+
+# 本次运行的生成时间：所有事件共用同一个 DTSTAMP
+_RUN_DTSTAMP = datetime.now(tz=TZ)
+_RUN_DTSTAMP_ICS = _RUN_DTSTAMP.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
 
 # 未来多少天（可在 GitHub Actions 里用 env DAYS_FORWARD 覆盖）
 DAYS_FORWARD = int(os.getenv("DAYS_FORWARD", "90"))
@@ -21,136 +30,354 @@ UNLOCK_MV_MIN_YI = float(os.getenv("UNLOCK_MV_MIN_YI", "5"))  # 解禁市值阈
 MAX_EVENTS_PER_DAY = int(os.getenv("MAX_EVENTS_PER_DAY", "30"))  # 同一天最多保留多少条（避免刷屏）
 os.makedirs(OUT_DIR, exist_ok=True)
 
+# AkShare 结果的本地缓存目录：同一天内重跑直接读缓存，不再请求网络（设为空字符串则不缓存）
+AK_CACHE_DIR = os.getenv("AK_CACHE_DIR", ".cache")
+
+# 事件描述里各字段的前缀：按顺序和取值配对，空值跳过，用“；”连接
+UNLOCK_DESC_LABELS = ("解禁数量: ", "解禁市值: ")
+MACRO_DESC_LABELS = ("重要性: ", "预期: ", "前值: ")
+
+# AkShare 常见的日期格式：整列解析前先用首个非空值探测，命中就带 format 解析，省掉 pandas 的格式推断
+_DATE_FMTS = ("%Y-%m-%d", "%Y%m%d", "%Y/%m/%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M")
+
+# RFC 5545 TEXT 转义：反斜杠、分号、逗号、换行
+_ICS_ESCAPE = str.maketrans({"\\": "\\\\", ";": "\\;", ",": "\\,", "\n": "\\n", "\r": ""})
+
+# _pick_col 模糊匹配时要删掉的字符（各种空白、括号、下划线、连字符），用 str.translate 一趟删完
+_NORM_TABLE = str.maketrans("", "", "".join(ch for ch in map(chr, range(0x3001)) if ch.isspace()) + "()（）_-")
+
+
+def _sniff_date_format(s: pd.Series) -> str | None:
+    """
+    取前若干个非空值逐个匹配 _DATE_FMTS，跳过“-”之类的占位符（最新几行常见，如未上市新股的上市日期）；
+    都不匹配时返回 None（交给 pandas 推断）
+    """
+    for v in s.dropna().head(20):
+        if not isinstance(v, str):
+            continue
+        v = v.strip()
+        for fmt in _DATE_FMTS:
+            try:
+                datetime.strptime(v, fmt)
+                return fmt
+            except ValueError:
+                continue
+    return None
+
+
+def _naive_ts(v) -> pd.Timestamp:
+    """单个值解析成北京时间的 naive Timestamp（带时区的先换算到 TZ），解析不了为 NaT"""
+    ts = pd.to_datetime(v, errors="coerce")
+    if ts is not pd.NaT and ts.tzinfo is not None:
+        ts = ts.tz_convert(TZ).tz_localize(None)
+    return ts
 
-def _to_dt(x) -> datetime | None:
-    """把各种日期格式安全转成 datetime（失败返回 None）"""
-    if x is None or (isinstance(x, float) and pd.isna(x)) or (hasattr(pd, "isna") and pd.isna(x)):
-        return None
+
+def _to_naive_datetime(s: pd.Series, fmt: str | None) -> pd.Series:
+    """
+    整列解析成北京时间的 naive datetime64；同一列里带时区和不带时区的值混在一起时
+    pandas 没法整列处理（报错或得到 object 列），这时退回逐个值解析
+    """
     try:
-        ts = pd.to_datetime(x)
-        if pd.isna(ts):
-            return None
-        if isinstance(ts, pd.Timestamp):
-            ts = ts.to_pydatetime()
-        if isinstance(ts, date) and not isinstance(ts, datetime):
-            ts = datetime(ts.year, ts.month, ts.day)
-        return ts
-    except Exception:
-        return None
+        # cache=True：同一天的日期串（几十只股票同日上市/解禁）只解析一次
+        d = pd.to_datetime(s, errors="coerce", format=fmt, cache=True)
+    except ValueError:
+        d = None
+    if d is None or not pd.api.types.is_datetime64_any_dtype(d):
+        return pd.to_datetime(s.map(_naive_ts), errors="coerce")
+    if d.dt.tz is not None:
+        d = d.dt.tz_convert(TZ).dt.tz_localize(None)
+    return d
+
+
+def _parse_dates(df: pd.DataFrame, col: str | None) -> pd.Series:
+    """整列解析日期并截到自然日（失败为 NaT，去掉时区）；格式不统一时只对解析失败的行逐个兜底"""
+    if not col:
+        return pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    s = df[col]
+    fmt = _sniff_date_format(s)
+    # 探测不到格式（如整列都是“-”占位）时直接按 mixed 逐个解析，避免 pandas 打印 “Could not infer format” 警告
+    d = _to_naive_datetime(s, fmt or "mixed")
+    if fmt:
+        bad = d.isna() & s.notna()
+        if bad.any():
+            d = d.fillna(_to_naive_datetime(s[bad], "mixed"))
+    return d.dt.normalize()
+
+
+def _in_range(d: pd.Series, start: date, end: date) -> pd.Series:
+    """日期列（_parse_dates 的结果）是否落在 [start, end]，NaT 为 False"""
+    return d.between(pd.Timestamp(start), pd.Timestamp(end))
+
+
+def _uid_hash(s: str) -> str:
+    """事件 UID 用的稳定短哈希（内置 hash 每个进程加盐，跨运行会变，日历客户端会重复导入）"""
+    return hashlib.blake2b(s.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _norm_col(s) -> str:
+    return str(s).translate(_NORM_TABLE)
+
+
+@functools.lru_cache(maxsize=32)
+def _norm_cols(cols: tuple) -> dict[str, str]:
+    """规范化列名 -> 原列名；同一张表会被查 4~6 次，按列名元组缓存"""
+    return {_norm_col(c): c for c in cols}
 
 
 def _pick_col(df: pd.DataFrame, candidates: list[str]) -> str | None:
     """从 DataFrame 中挑选匹配列名（精确+模糊）"""
-    cols = list(df.columns)
+    cols = tuple(df.columns)
     for c in candidates:
         if c in cols:
             return c
 
-    def norm(s: str) -> str:
-        return re.sub(r"[\s\(\)（）_\-]", "", str(s))
-
-    ncols = {norm(c): c for c in cols}
+    ncols = _norm_cols(cols)
     for c in candidates:
-        nc = norm(c)
+        nc = _norm_col(c)
         if nc in ncols:
             return ncols[nc]
     return None
 
 
-def make_cal(name: str) -> Calendar:
-    cal = Calendar()
-    cal.add("prodid", f"-//{name}//CN Market Calendar//")
-    cal.add("version", "2.0")
-    cal.add("calscale", "GREGORIAN")
-    cal.add("X-WR-CALNAME", name)          # 苹果日历显示名
-    cal.add("X-WR-TIMEZONE", "Asia/Shanghai")
-    return cal
+def _cap_per_day(df: pd.DataFrame) -> pd.DataFrame:
+    """同一天（按 _d 列）最多保留 MAX_EVENTS_PER_DAY 行，保持当前行序取前 N 条"""
+    return df.groupby("_d", sort=False).head(MAX_EVENTS_PER_DAY)
+
+
+def _clean_str_cols(df: pd.DataFrame, cols: list[str | None]):
+    """
+    把文本列整列转成去空白的字符串（缺失值为空串），替代逐行 str(...).strip()
+    显式用 python 存储的 StringDtype：不依赖 pyarrow，装没装 pyarrow 行为都一样
+    """
+    for c in cols:
+        if c:
+            df[c] = df[c].astype("string[python]").str.strip().fillna("")
+
+
+def _as_category(df: pd.DataFrame, cols: list[str | None]):
+    """取值很少的文本列（如宏观重要性）转成 category，之后 map 只需对每个不同取值算一次"""
+    for c in cols:
+        if c:
+            df[c] = df[c].astype("category")
+
+
+def _drop_dup_events(df: pd.DataFrame, id_cols: list[str | None], date_cols: list[str]) -> pd.DataFrame:
+    """同一标识（代码/名称等）在同一天的重复行只留第一条，避免输出重复 UID；没有可用标识列时不去重"""
+    ids = [c for c in id_cols if c]
+    if not ids:
+        return df
+    return df.drop_duplicates(subset=ids + date_cols)
+
+
+def _title_col(df: pd.DataFrame, code_col: str | None, name_col: str | None, default: str) -> pd.Series:
+    """整列拼事件标题：名称(代码)；只有其一就用其一，都没有用 default（两列需先经 _clean_str_cols 处理）"""
+    empty = pd.Series("", index=df.index, dtype=object)
+    code = df[code_col] if code_col else empty
+    nm = df[name_col] if name_col else empty
+    title = nm.where(nm != "", code)
+    title = title.where(title != "", default)
+    return title.mask((nm != "") & (code != ""), nm + "(" + code + ")")
+
+
+def _join_desc(labels: tuple[str, ...], values: tuple[str, ...]) -> str:
+    return "；".join(label + v for label, v in zip(labels, values) if v)
+
+
+def _iter_rows(df: pd.DataFrame, cols: list[str | None]):
+    """按给定列顺序逐行产出普通 tuple（列名为 None 的位置填空串），替代 iterrows 的逐行 Series 构造"""
+    sub = pd.DataFrame({i: (df[c] if c else "") for i, c in enumerate(cols)}, index=df.index)
+    return sub.itertuples(index=False, name=None)
+
+
+def _ics_escape(text: str) -> str:
+    return text.translate(_ICS_ESCAPE)
+
+
+def _ics_fold(line: str) -> str:
+    """超过 75 字节的内容行按 RFC 5545 折行（续行以空格开头，不拆开多字节字符）"""
+    if len(line.encode("utf-8")) <= 75:
+        return line
+    parts, cur, n, limit = [], [], 0, 75
+    for ch in line:
+        w = len(ch.encode("utf-8"))
+        if n + w > limit:
+            parts.append("".join(cur))
+            cur, n, limit = [], 0, 74
+        cur.append(ch)
+        n += w
+    parts.append("".join(cur))
+    return "\r\n ".join(parts)
+
+
+def _ics_lines(lines: list[str]) -> bytes:
+    """拼成 CRLF 结尾的内容行（逐行折行）"""
+    return "".join(_ics_fold(line) + "\r\n" for line in lines).encode("utf-8")
+
+
+class IcsCalendar:
+    """
+    极简 VCALENDAR：VEVENT 序列化后直接写进字节缓冲，写盘时再套上头尾
+    全天事件由 add_all_day_event 直接拼文本；带时刻的事件仍可用 icalendar.Event 经 add_component 加入
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.buf = io.BytesIO()
+
+    def write(self, chunk: bytes):
+        self.buf.write(chunk)
+
+    def add_component(self, ev: Event):
+        self.buf.write(ev.to_ical())
+
+    def _header(self) -> bytes:
+        return _ics_lines([
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"PRODID:-//{_ics_escape(self.name)}//CN Market Calendar//",
+            "CALSCALE:GREGORIAN",
+            f"X-WR-CALNAME:{_ics_escape(self.name)}",  # 苹果日历显示名
+            "X-WR-TIMEZONE:Asia/Shanghai",
+        ])
+
+    def write_to(self, f):
+        """直接把头、缓冲区、尾依次写进文件，不先拼成一整块 bytes"""
+        f.write(self._header())
+        f.write(self.buf.getbuffer())
+        f.write(b"END:VCALENDAR\r\n")
+
+
+def make_cal(name: str) -> IcsCalendar:
+    return IcsCalendar(name)
+
+
+def merge_cals(name: str, cals: list[IcsCalendar]) -> IcsCalendar:
+    """
+    总合集直接拼接各分主题日历的 VEVENT 字节（缓冲区里本来就不含头尾），
+    不再让每个事件同时写两份
+    """
+    merged = make_cal(name)
+    for c in cals:
+        merged.write(c.buf.getbuffer())
+    return merged
 
 
 def add_all_day_event(cals, day: date, summary: str, description: str = "", uid: str = ""):
     """
-    同一个事件写入多个 Calendar（例如分类日历 + 总日历）
-    关键：每个日历都重新创建一个 Event（避免出现嵌套 VEVENT）
+    同一个事件写入一个或多个日历（总合集由 merge_cals 最后拼接，生成器一般只传分类日历）
+    全天事件不走 icalendar 的 Event 对象：直接按固定模板拼出 VEVENT 文本，只编码一次，各日历共用同一段字节
     """
     if not isinstance(cals, (list, tuple)):
         cals = [cals]
 
+    uid = uid or f"{summary}-{day.isoformat()}@cn-market-calendar"
+    # 日期/时间戳行是定长 ASCII，只有文本属性可能超长需要折行
+    summary_line = _ics_fold(f"SUMMARY:{_ics_escape(summary)}")
+    uid_line = _ics_fold(f"UID:{_ics_escape(uid)}")
+    desc_line = _ics_fold(f"DESCRIPTION:{_ics_escape(description)}") + "\r\n" if description else ""
+
+    chunk = (
+        f"BEGIN:VEVENT\r\n"
+        f"{summary_line}\r\n"
+        f"DTSTART;VALUE=DATE:{day:%Y%m%d}\r\n"
+        f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}\r\n"
+        f"DTSTAMP:{_RUN_DTSTAMP_ICS}\r\n"
+        f"{uid_line}\r\n"
+        f"{desc_line}"
+        f"END:VEVENT\r\n"
+    ).encode("utf-8")
     for cal in cals:
-        ev = Event()
-        ev.add("summary", summary)
-        ev.add("dtstart", day)
-        ev.add("dtend", day + timedelta(days=1))
-        if description:
-            ev.add("description", description)
-        ev.add("uid", uid or f"{summary}-{day.isoformat()}@cn-market-calendar")
-        ev.add("dtstamp", datetime.now(tz=TZ))
-        cal.add_component(ev)
-
-
-def write_ics(cal: Calendar, filename: str):
+        cal.write(chunk)
+
+
+def _write_ics_now(cal: IcsCalendar, filename: str):
     path = os.path.join(OUT_DIR, filename)
-    with open(path, "wb") as f:
-        f.write(cal.to_ical())
+    with open(path, "wb", buffering=1 << 20) as f:
+        cal.write_to(f)
     print("Wrote:", path)
 
 
+def flush_ics(jobs: list[tuple[IcsCalendar, str]]):
+    """把 (日历, 文件名) 一次性写出（纯 I/O 步骤，线程池并发）"""
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        list(ex.map(lambda job: _write_ics_now(*job), jobs))
+
+
+@functools.lru_cache(maxsize=1)
 def date_range() -> tuple[date, date]:
-    start = datetime.now(tz=TZ).date()
-    end = (datetime.now(tz=TZ) + timedelta(days=DAYS_FORWARD)).date()
-    return start, end
+    """整个进程只取一次“今天”，所有生成器（跨零点运行时也）看到同一个日期窗口"""
+    today = datetime.now(tz=TZ).date()
+    return today, today + timedelta(days=DAYS_FORWARD)
+
+
+def _cached(name: str, fetch) -> pd.DataFrame:
+    """
+    按“接口名 + 当天日期”把 AkShare 返回的 DataFrame 缓存到磁盘
+    用 pickle 而不是 parquet：AkShare 的表里常有 date 对象和字符串混在一列，parquet 不一定存得下
+    """
+    if not AK_CACHE_DIR:
+        return fetch()
+    path = os.path.join(AK_CACHE_DIR, f"{name}-{date_range()[0]:%Y%m%d}.pkl")
+    if os.path.exists(path):
+        return pd.read_pickle(path)
+    df = fetch()
+    os.makedirs(AK_CACHE_DIR, exist_ok=True)
+    # 同一接口只留当天一份：先删掉以前日期的缓存，避免 .cache/ 无限增长
+    for old in glob.glob(os.path.join(glob.escape(AK_CACHE_DIR), f"{glob.escape(name)}-*.pkl")):
+        os.remove(old)
+    tmp = f"{path}.tmp"
+    df.to_pickle(tmp)
+    os.replace(tmp, path)  # 先写临时文件再改名，避免中途失败留下半个缓存
+    return df
 
 
 # --------------------------
 # 01 新股：申购 / 缴款 / 上市
 # --------------------------
-def gen_ipo_calendar(cal_all: Calendar):
-    import akshare as ak
+def fetch_ipo(ak) -> pd.DataFrame:
+    return _cached("stock_xgsglb_em", ak.stock_xgsglb_em)
 
+
+def gen_ipo_calendar(df: pd.DataFrame) -> IcsCalendar:
     start, end = date_range()
     cal = make_cal("A股｜新股申购/缴款/上市")
 
-    df = ak.stock_xgsglb_em()
-
     code_col = _pick_col(df, ["股票代码", "申购代码"])
     name_col = _pick_col(df, ["股票简称"])
     apply_col = _pick_col(df, ["申购日期"])
     pay_col = _pick_col(df, ["中签缴款日期", "网上申购缴款日"])
     list_col = _pick_col(df, ["上市日期", "上市日"])
 
-    def in_range(d: datetime | None) -> bool:
-        if not d:
-            return False
-        dd = d.date()
-        return start <= dd <= end
+    # 三个日期列各自解析；不在范围内的置为 NaT，只保留至少有一个日期命中的行
+    # 用 assign 生成新表，不改调用方传进来的 DataFrame
+    parsed = {key: _parse_dates(df, c) for key, c in (("_apply", apply_col), ("_pay", pay_col), ("_list", list_col))}
+    df = df.assign(**{key: d.where(_in_range(d, start, end)) for key, d in parsed.items()})
+    df = df[df[["_apply", "_pay", "_list"]].notna().any(axis=1)].copy()
 
-    for _, r in df.iterrows():
-        code = str(r.get(code_col, "")).strip() if code_col else ""
-        nm = str(r.get(name_col, "")).strip() if name_col else ""
-        title = f"{nm}({code})" if code and nm else (nm or code or "新股")
+    # 窗口内没有事件：直接返回空日历，跳过后续整列清洗/去重
+    if df.empty:
+        return cal
 
-        d_apply = _to_dt(r.get(apply_col)) if apply_col else None
-        d_pay = _to_dt(r.get(pay_col)) if pay_col else None
-        d_list = _to_dt(r.get(list_col)) if list_col else None
+    _clean_str_cols(df, [code_col, name_col])
+    df = _drop_dup_events(df, [code_col or name_col], ["_apply", "_pay", "_list"])
+    df["_title"] = _title_col(df, code_col, name_col, "新股")
 
-        if in_range(d_apply):
-            add_all_day_event([cal, cal_all], d_apply.date(), f"新股申购｜{title}", uid=f"ipo-apply-{code}-{d_apply.date()}")
-        if in_range(d_pay):
-            add_all_day_event([cal, cal_all], d_pay.date(), f"中签缴款｜{title}", uid=f"ipo-pay-{code}-{d_pay.date()}")
-        if in_range(d_list):
-            add_all_day_event([cal, cal_all], d_list.date(), f"新股上市｜{title}", uid=f"ipo-list-{code}-{d_list.date()}")
+    for code, title, d_apply, d_pay, d_list in _iter_rows(df, [code_col, "_title", "_apply", "_pay", "_list"]):
+        if pd.notna(d_apply):
+            add_all_day_event(cal, d_apply.date(), f"新股申购｜{title}", uid=f"ipo-apply-{code}-{d_apply.date()}")
+        if pd.notna(d_pay):
+            add_all_day_event(cal, d_pay.date(), f"中签缴款｜{title}", uid=f"ipo-pay-{code}-{d_pay.date()}")
+        if pd.notna(d_list):
+            add_all_day_event(cal, d_list.date(), f"新股上市｜{title}", uid=f"ipo-list-{code}-{d_list.date()}")
 
-    write_ics(cal, "01_ipo.ics")
+    return cal
 
 
 # --------------------------
 # 02 解禁：限售解禁日历
 # --------------------------
-def gen_unlock_calendar(cal_all: Calendar):
-    import akshare as ak
-
-    start, end = date_range()
-    cal = make_cal("A股｜限售解禁")
-
+def fetch_unlock(ak) -> pd.DataFrame:
     df = None
     tried = []
 
@@ -165,7 +392,7 @@ def gen_unlock_calendar(cal_all: Calendar):
         if hasattr(ak, fn):
             tried.append(fn)
             try:
-                df = getattr(ak, fn)()
+                df = _cached(fn, getattr(ak, fn))
                 break
             except Exception:
                 df = None
@@ -175,6 +402,12 @@ def gen_unlock_calendar(cal_all: Calendar):
             f"未找到可用的全市场解禁接口（已尝试：{tried}）。"
             f"请升级 akshare 或把你本地可用的解禁函数名发我。"
         )
+    return df
+
+
+def gen_unlock_calendar(df: pd.DataFrame) -> IcsCalendar:
+    start, end = date_range()
+    cal = make_cal("A股｜限售解禁")
 
     date_col = _pick_col(df, ["解禁日期", "日期"])
     code_col = _pick_col(df, ["股票代码", "代码"])
@@ -182,176 +415,183 @@ def gen_unlock_calendar(cal_all: Calendar):
     amt_col = _pick_col(df, ["解禁数量", "解禁股数", "数量", "解禁数量(万股)"])
     mv_col = _pick_col(df, ["解禁市值", "市值", "解禁市值(亿元)"])
 
-    for _, r in df.iterrows():
-        d = _to_dt(r.get(date_col)) if date_col else None
-        if not d:
-            continue
-        dd = d.date()
-        if not (start <= dd <= end):
-            continue
+    df = df.assign(_d=_parse_dates(df, date_col))
+    df = df[_in_range(df["_d"], start, end)].copy()
 
-        code = str(r.get(code_col, "")).strip() if code_col else ""
-        nm = str(r.get(name_col, "")).strip() if name_col else ""
-        amt = str(r.get(amt_col, "")).strip() if amt_col else ""
-        mv = str(r.get(mv_col, "")).strip() if mv_col else ""
+    if df.empty:
+        return cal
 
-        title = f"{nm}({code})" if code and nm else (nm or code or "解禁")
-        desc = "；".join([x for x in [
-            f"解禁数量: {amt}" if amt else "",
-            f"解禁市值: {mv}" if mv else ""
-        ] if x])
+    _clean_str_cols(df, [code_col, name_col, amt_col, mv_col])
+    df = _drop_dup_events(df, [code_col or name_col], ["_d"])
 
-                # 过滤：只保留“解禁市值 >= 阈值”的大解禁
-        mv_yi = None
-        if mv:
-            try:
-                mv_yi = float(str(mv).replace(",", "").replace("亿", "").strip())
-            except Exception:
-                mv_yi = None
+    # 过滤：只保留“解禁市值 >= 阈值”的大解禁（解析不出市值的保留）
+    if mv_col:
+        df["_mv_yi"] = pd.to_numeric(
+            df[mv_col].astype(str).str.replace(",", "", regex=False).str.replace("亿", "", regex=False).str.strip(),
+            errors="coerce",
+        )
+        df = df[df["_mv_yi"].isna() | (df["_mv_yi"] >= UNLOCK_MV_MIN_YI)].copy()
+        # 同日超出上限时优先保留市值大的
+        df = df.sort_values("_mv_yi", ascending=False, na_position="last", kind="stable")
+    df = _cap_per_day(df)
 
-        if mv_yi is not None and mv_yi < UNLOCK_MV_MIN_YI:
-            continue
+    df["_title"] = _title_col(df, code_col, name_col, "解禁")
 
-        add_all_day_event([cal, cal_all], dd, f"限售解禁｜{title}", description=desc, uid=f"unlock-{code}-{dd}")
+    for d, code, title, amt, mv in _iter_rows(df, ["_d", code_col, "_title", amt_col, mv_col]):
+        dd = d.date()
+        desc = _join_desc(UNLOCK_DESC_LABELS, (amt, mv))
 
-    write_ics(cal, "02_unlock.ics")
+        add_all_day_event(cal, dd, f"限售解禁｜{title}", description=desc, uid=f"unlock-{code}-{dd}")
+
+    return cal
 
 
 # --------------------------
 # 03 财报：预约/实际披露
 # --------------------------
-def gen_earnings_calendar(cal_all: Calendar):
-    import akshare as ak
+def fetch_earnings(ak) -> pd.DataFrame:
+    return _cached("stock_yysj_em", ak.stock_yysj_em)
+
 
+def gen_earnings_calendar(df: pd.DataFrame) -> IcsCalendar:
     start, end = date_range()
     cal = make_cal("A股｜财报披露（预约）")
 
-    df = ak.stock_yysj_em()
-
     code_col = _pick_col(df, ["股票代码", "代码"])
     name_col = _pick_col(df, ["股票简称", "名称"])
     first_col = _pick_col(df, ["首次预约", "首次预约披露", "首次预约时间"])
     actual_col = _pick_col(df, ["实际披露", "实际披露时间"])
     report_col = _pick_col(df, ["报告期", "报告期别", "报告期类型"])
 
-    for _, r in df.iterrows():
-        code = str(r.get(code_col, "")).strip() if code_col else ""
-        nm = str(r.get(name_col, "")).strip() if name_col else ""
-        rp = str(r.get(report_col, "")).strip() if report_col else ""
-        title = f"{nm}({code})" if code and nm else (nm or code or "财报")
+    # 优先实际披露日，缺失时退回首次预约日
+    df = df.assign(_d=_parse_dates(df, actual_col).fillna(_parse_dates(df, first_col)))
+    df = df[_in_range(df["_d"], start, end)].copy()
 
-        d = _to_dt(r.get(actual_col)) if actual_col else None
-        if not d and first_col:
-            d = _to_dt(r.get(first_col))
-        if not d:
-            continue
+    if df.empty:
+        return cal
+
+    _clean_str_cols(df, [code_col, name_col, report_col])
+    df = _cap_per_day(_drop_dup_events(df, [code_col or name_col], ["_d"]))
+    df["_title"] = _title_col(df, code_col, name_col, "财报")
 
+    for d, code, title, rp in _iter_rows(df, ["_d", code_col, "_title", report_col]):
         dd = d.date()
-        if not (start <= dd <= end):
-            continue
 
         add_all_day_event(
-            [cal, cal_all],
+            cal,
             dd,
             f"财报披露｜{title}" + (f"｜{rp}" if rp else ""),
             uid=f"earn-{code}-{dd}"
         )
 
-    write_ics(cal, "03_earnings.ics")
+    return cal
 
 
 # --------------------------
 # 04 分红/除权除息
 # --------------------------
-def gen_dividend_calendar(cal_all: Calendar):
-    import akshare as ak
+def fetch_dividend(ak) -> pd.DataFrame:
+    # 不同版本的 AkShare 分红接口不同，这里做一次兜底
+    if hasattr(ak, "stock_fhps_em"):
+        return _cached("stock_fhps_em", ak.stock_fhps_em)
+    if hasattr(ak, "stock_fhps_detail_em"):
+        return _cached("stock_fhps_detail_em", ak.stock_fhps_detail_em)
+    raise RuntimeError(
+        "你本地 akshare 缺少分红接口（stock_fhps_em / stock_fhps_detail_em）。"
+        "请升级 akshare，或把你本地可用的分红函数名发我。"
+    )
+
 
+def gen_dividend_calendar(df: pd.DataFrame) -> IcsCalendar:
     start, end = date_range()
     cal = make_cal("A股｜分红/除权除息")
 
-    # 不同版本的 AkShare 分红接口不同，这里做一次兜底
-    if hasattr(ak, "stock_fhps_em"):
-        df = ak.stock_fhps_em()
-    elif hasattr(ak, "stock_fhps_detail_em"):
-        df = ak.stock_fhps_detail_em()
-    else:
-        raise RuntimeError(
-            "你本地 akshare 缺少分红接口（stock_fhps_em / stock_fhps_detail_em）。"
-            "请升级 akshare，或把你本地可用的分红函数名发我。"
-        )
-
     date_col = _pick_col(df, ["除权除息日", "除息日", "权益登记日", "日期"])
     code_col = _pick_col(df, ["代码", "股票代码"])
     name_col = _pick_col(df, ["名称", "股票简称"])
     plan_col = _pick_col(df, ["分红方案", "方案", "送转派", "派息方案"])
 
-    for _, r in df.iterrows():
-        d = _to_dt(r.get(date_col)) if date_col else None
-        if not d:
-            continue
-        dd = d.date()
-        if not (start <= dd <= end):
-            continue
+    df = df.assign(_d=_parse_dates(df, date_col))
+    df = df[_in_range(df["_d"], start, end)].copy()
 
-        code = str(r.get(code_col, "")).strip() if code_col else ""
-        nm = str(r.get(name_col, "")).strip() if name_col else ""
-        plan = str(r.get(plan_col, "")).strip() if plan_col else ""
-        title = f"{nm}({code})" if code and nm else (nm or code or "分红")
+    # 分红表是历史归档，经常整表都不在窗口内
+    if df.empty:
+        return cal
+
+    _clean_str_cols(df, [code_col, name_col, plan_col])
+    df = _cap_per_day(_drop_dup_events(df, [code_col or name_col], ["_d"]))
+    df["_title"] = _title_col(df, code_col, name_col, "分红")
+
+    for d, code, title, plan in _iter_rows(df, ["_d", code_col, "_title", plan_col]):
+        dd = d.date()
 
         add_all_day_event(
-            [cal, cal_all],
+            cal,
             dd,
             f"分红/除权除息｜{title}",
             description=plan,
             uid=f"div-{code}-{dd}"
         )
 
-    write_ics(cal, "04_dividend.ics")
+    return cal
 
 
 # --------------------------
 # 05 指数调样（规则日）
 # --------------------------
-def gen_index_rebalance_calendar(cal_all: Calendar):
+def gen_index_rebalance_calendar() -> IcsCalendar:
     # 规则日历：3/6/9/12 月第二个周五（通常生效为下一交易日，以公告为准）
     start, end = date_range()
     cal = make_cal("A股｜指数调样（规则日）")
 
     def second_friday(y: int, m: int) -> date:
-        d = date(y, m, 1)
-        while d.weekday() != 4:  # Friday=4
-            d += timedelta(days=1)
-        return d + timedelta(days=7)
-
-    cursor = start.replace(day=1)
-    while cursor <= end:
-        if cursor.month in (3, 6, 9, 12):
-            d = second_friday(cursor.year, cursor.month)
+        first = date(y, m, 1)
+        return first + timedelta(days=(4 - first.weekday()) % 7 + 7)  # Friday=4
+
+    # 只枚举范围内各年的 3/6/9/12 月，不逐月推进
+    for y in range(start.year, end.year + 1):
+        for m in (3, 6, 9, 12):
+            d = second_friday(y, m)
             if start <= d <= end:
                 add_all_day_event(
-                    [cal, cal_all],
+                    cal,
                     d,
                     "指数样本定期调整窗口（按规则推算；最终以公告为准）",
                     uid=f"idx-reb-{d}"
                 )
-        cursor = (cursor + relativedelta(months=1)).replace(day=1)
 
-    write_ics(cal, "05_index_rebalance_rules.ics")
+    return cal
 
 
 # --------------------------
 # 06 宏观数据/事件（日历源：华尔街见闻宏观日历）
 # --------------------------
-def gen_macro_calendar(cal_all: Calendar):
-    import akshare as ak
-
-    start, end = date_range()
-    cal = make_cal("宏观｜重要经济数据/事件")
-
+def fetch_macro(ak) -> pd.DataFrame:
     if not hasattr(ak, "macro_info_ws"):
         raise RuntimeError("你本地 akshare 缺少宏观日历接口 macro_info_ws，请升级 akshare。")
 
-    df = ak.macro_info_ws()
+    return _cached("macro_info_ws", ak.macro_info_ws)
+
+
+def _macro_important(imp: str) -> bool:
+    """去噪：只保留高重要性（不同数据源格式不一，尽量兼容；空值/不认识的格式不过滤）"""
+    if not imp:
+        return True
+    # 常见：★★★★★ / 3 / 高 / 重要 / ★★★ 等
+    if ("高" in imp) or ("重要" in imp):
+        return True
+    # 提取数字重要性（如 1/2/3/4/5）
+    nums = re.findall(r"\d+", imp)
+    if nums:
+        return int(nums[0]) >= 3
+    if "★" in imp:
+        return imp.count("★") >= 3
+    return True
+
+
+def gen_macro_calendar(df: pd.DataFrame) -> IcsCalendar:
+    start, end = date_range()
+    cal = make_cal("宏观｜重要经济数据/事件")
 
     time_col = _pick_col(df, ["时间", "date", "datetime"])
     country_col = _pick_col(df, ["国家", "country"])
@@ -360,207 +600,201 @@ def gen_macro_calendar(cal_all: Calendar):
     exp_col = _pick_col(df, ["预期", "forecast"])
     pre_col = _pick_col(df, ["前值", "previous"])
 
-    for _, r in df.iterrows():
-        dtt = _to_dt(r.get(time_col)) if time_col else None
-        if not dtt:
-            continue
-        dd = dtt.date()
-        if not (start <= dd <= end):
-            continue
+    df = df.assign(_d=_parse_dates(df, time_col))
+    df = df[_in_range(df["_d"], start, end)].copy()
 
-        ctry = str(r.get(country_col, "")).strip() if country_col else ""
-        evn = str(r.get(event_col, "")).strip() if event_col else ""
-        imp = str(r.get(imp_col, "")).strip() if imp_col else ""
-        exp = str(r.get(exp_col, "")).strip() if exp_col else ""
-        pre = str(r.get(pre_col, "")).strip() if pre_col else ""
+    if df.empty:
+        return cal
 
-                # 去噪：只保留重点国家（可按需加/减）
-        if ctry and ctry not in ("中国", "美国", "欧元区"):
-            continue
+    _clean_str_cols(df, [country_col, event_col, imp_col, exp_col, pre_col])
+    _as_category(df, [imp_col])
 
-        # 去噪：只保留高重要性（不同数据源格式不一，尽量兼容）
-        if imp:
-            imp_s = str(imp)
-            # 常见：★★★★★ / 3 / 高 / 重要 / ★★★ 等
-            if ("高" in imp_s) or ("重要" in imp_s):
-                pass
-            else:
-                # 提取数字重要性（如 1/2/3/4/5）
-                nums = re.findall(r"\d+", imp_s)
-                if nums:
-                    try:
-                        if int(nums[0]) < 3:
-                            continue
-                    except Exception:
-                        pass
-                elif "★" in imp_s:
-                    if imp_s.count("★") < 3:
-                        continue
-                else:
-                    # 不认识的格式：不过滤
-                    pass
+    # 去噪：只保留重点国家（可按需加/减）
+    if country_col:
+        df = df[(df[country_col] == "") | df[country_col].isin(("中国", "美国", "欧元区"))]
+    # 去噪：只保留高重要性；category 列上 map 只对每个不同取值算一次
+    if imp_col:
+        df = df[df[imp_col].map(_macro_important).astype(bool)]
+    df = _cap_per_day(_drop_dup_events(df, [country_col, event_col], ["_d"]))
+
+    rows = _iter_rows(df, ["_d", country_col, event_col, imp_col, exp_col, pre_col])
+    for dtt, ctry, evn, imp, exp, pre in rows:
+        dd = dtt.date()
 
         summary = f"{ctry}｜{evn}" if ctry else evn
-        desc = "；".join([x for x in [
-            f"重要性: {imp}" if imp else "",
-            f"预期: {exp}" if exp else "",
-            f"前值: {pre}" if pre else ""
-        ] if x])
+        desc = _join_desc(MACRO_DESC_LABELS, (imp, exp, pre))
 
         add_all_day_event(
-            [cal, cal_all],
+            cal,
             dd,
             f"宏观数据｜{summary}",
             description=desc,
-            uid=f"macro-{dd}-{abs(hash(summary))}"
+            uid=f"macro-{dd}-{_uid_hash(summary)}"
         )
 
-    write_ics(cal, "06_macro.ics")
+    return cal
 
-def gen_cn_report_deadlines_template(cal_all: Calendar):
+# 模板日历的规则表：每年/每月都相同，模块加载时建一次，生成器只按年份/月份套用
+# (月, 日, 标题)：财报披露硬截止日
+FIXED_REPORT_DAYS = (
+    (4, 30, "A股｜一季报披露截止日（通常4/30）"),
+    (4, 30, "A股｜年报披露截止日（通常4/30）"),
+    (8, 31, "A股｜中报披露截止日（通常8/31）"),
+    (10, 31, "A股｜三季报披露截止日（通常10/31）"),
+)
+
+# ((起始月, 日), (结束月, 日), 标题)：经验窗口，全是全天事件，不会误导到具体时刻
+REPORT_WINDOWS = (
+    ((1, 10), (1, 31), "A股｜年报预告/快报密集窗口（经验）"),
+    ((4, 1), (4, 30), "A股｜财报披露高峰（月度窗口）"),
+    ((7, 1), (7, 31), "A股｜中报预告密集窗口（经验）"),
+    ((8, 1), (8, 31), "A股｜中报披露高峰（月度窗口）"),
+    ((10, 1), (10, 31), "A股｜三季报披露高峰（月度窗口）"),
+)
+
+# (每月第几日, UID 前缀, 标题)：中国宏观数据常见窗口；日为 None 表示当月最后一天
+MACRO_TEMPLATE_DAYS = (
+    (7, "fx", "宏观｜外汇储备公布窗口（经验：上旬）"),        # 外汇储备：常见在每月上旬
+    (10, "cpi", "宏观｜CPI/PPI公布窗口（经验：上旬）"),        # CPI/PPI：常见在每月上旬
+    (15, "ts", "宏观｜社融/信贷/M2公布窗口（经验：中旬）"),    # 社融/信贷/M2：常见在每月中旬
+    (20, "lpr", "宏观｜LPR报价日（每月20日）"),                # LPR：每月 20 日（相对固定）
+    (None, "pmi", "宏观｜PMI公布窗口（月末/次月初附近）"),     # PMI：常见在月末
+)
+
+
+def gen_cn_report_deadlines_template() -> IcsCalendar:
     """A股财报披露硬截止日 + 常见密集窗口（规则/经验层）"""
     start, end = date_range()
     cal = make_cal("模板｜财报季与窗口（规则）")
 
-    y = start.year
     # 覆盖未来一年多一点
-    years = {y, y + 1}
-
-    for yy in sorted(years):
-        fixed_days = [
-            (date(yy, 4, 30), "A股｜一季报披露截止日（通常4/30）"),
-            (date(yy, 4, 30), "A股｜年报披露截止日（通常4/30）"),
-            (date(yy, 8, 31), "A股｜中报披露截止日（通常8/31）"),
-            (date(yy, 10, 31), "A股｜三季报披露截止日（通常10/31）"),
-        ]
-        for d, s in fixed_days:
+    for yy in (start.year, start.year + 1):
+        for m, dd, s in FIXED_REPORT_DAYS:
+            d = date(yy, m, dd)
             if start <= d <= end:
-                add_all_day_event([cal, cal_all], d, s, uid=f"tpl-report-deadline-{s}-{d}")
-
-        # 经验窗口：用“周”做区间（全是全天事件，不会误导到具体时刻）
-        windows = [
-            (date(yy, 1, 10), date(yy, 1, 31), "A股｜年报预告/快报密集窗口（经验）"),
-            (date(yy, 4, 1), date(yy, 4, 30), "A股｜财报披露高峰（月度窗口）"),
-            (date(yy, 7, 1), date(yy, 7, 31), "A股｜中报预告密集窗口（经验）"),
-            (date(yy, 8, 1), date(yy, 8, 31), "A股｜中报披露高峰（月度窗口）"),
-            (date(yy, 10, 1), date(yy, 10, 31), "A股｜三季报披露高峰（月度窗口）"),
-        ]
-        for d1, d2, s in windows:
+                add_all_day_event(cal, d, s, uid=f"tpl-report-deadline-{s}-{d}")
+
+        for (m1, dd1), (m2, dd2), s in REPORT_WINDOWS:
             # 用开始日标记窗口即可（不做每日重复，避免刷屏）
+            d1 = date(yy, m1, dd1)
             if start <= d1 <= end:
-                add_all_day_event([cal, cal_all], d1, s, description=f"窗口范围：{d1} ~ {d2}", uid=f"tpl-window-{s}-{d1}")
+                d2 = date(yy, m2, dd2)
+                add_all_day_event(cal, d1, s, description=f"窗口范围：{d1} ~ {d2}", uid=f"tpl-window-{s}-{d1}")
 
-    write_ics(cal, "07_report_templates.ics")
+    return cal
 
 
-def gen_cn_macro_template(cal_all: Calendar):
+def gen_cn_macro_template() -> IcsCalendar:
     """中国宏观数据发布时间“常见窗口”（规则/经验层）"""
     start, end = date_range()
     cal = make_cal("模板｜中国宏观数据窗口（经验）")
 
-    # 生成未来 N 个月的“窗口提示”
-    cursor = date(start.year, start.month, 1)
-
-    while cursor <= end:
-        yy, mm = cursor.year, cursor.month
-
-        # 1) 外汇储备：常见在每月上旬（这里用每月第 7 日作为提醒点）
-        d_fx = date(yy, mm, 7)
-        if start <= d_fx <= end:
-            add_all_day_event([cal, cal_all], d_fx, f"宏观｜外汇储备公布窗口（经验：上旬）", uid=f"tpl-macro-fx-{d_fx}")
+    # 生成未来 N 个月的“窗口提示”：直接按 (年, 月) 序号枚举范围内的月份
+    for k in range(start.year * 12 + start.month - 1, end.year * 12 + end.month):
+        yy, mm = divmod(k, 12)
+        mm += 1
+        last = calendar.monthrange(yy, mm)[1]
 
-        # 2) CPI/PPI：常见在每月上旬（这里用第 10 日）
-        d_cpi = date(yy, mm, 10)
-        if start <= d_cpi <= end:
-            add_all_day_event([cal, cal_all], d_cpi, f"宏观｜CPI/PPI公布窗口（经验：上旬）", uid=f"tpl-macro-cpi-{d_cpi}")
-
-        # 3) 社融/信贷/M2：常见在每月中旬（这里用第 15 日）
-        d_ts = date(yy, mm, 15)
-        if start <= d_ts <= end:
-            add_all_day_event([cal, cal_all], d_ts, f"宏观｜社融/信贷/M2公布窗口（经验：中旬）", uid=f"tpl-macro-ts-{d_ts}")
-
-        # 4) LPR：每月 20 日（相对固定）
-        d_lpr = date(yy, mm, 20)
-        if start <= d_lpr <= end:
-            add_all_day_event([cal, cal_all], d_lpr, f"宏观｜LPR报价日（每月20日）", uid=f"tpl-macro-lpr-{d_lpr}")
+        for dd, key, s in MACRO_TEMPLATE_DAYS:
+            d = date(yy, mm, dd or last)
+            if start <= d <= end:
+                add_all_day_event(cal, d, s, uid=f"tpl-macro-{key}-{d}")
 
-        # 5) PMI：常见在月末（这里用每月最后一天）
-        # 计算当月最后一天
-        next_month = (cursor + relativedelta(months=1))
-        last_day = next_month - timedelta(days=1)
-        if start <= last_day <= end:
-            add_all_day_event([cal, cal_all], last_day, f"宏观｜PMI公布窗口（月末/次月初附近）", uid=f"tpl-macro-pmi-{last_day}")
+    return cal
 
-        cursor = cursor + relativedelta(months=1)
+@functools.lru_cache(maxsize=1)
+def _http_session():
+    """共享 requests.Session：连接池复用 + 失败自动重试 + gzip"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_maxsize=8, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": "Mozilla/5.0 (compatible; github-actions; +https://github.com/)",
+        "Accept-Encoding": "gzip, deflate",
+    })
+    return session
+
+
+def _table_grid(t: pd.DataFrame) -> pd.DataFrame:
+    """把 read_html 的结果还原成纯文本网格：被识别成列名的表头放回成普通行，空单元格为空串"""
+    body = t.astype(object).where(t.notna(), "").astype(str)
+    body.columns = range(body.shape[1])
+    if not isinstance(t.columns, pd.RangeIndex):
+        head = t.columns.to_frame(index=False).T.astype(str)
+        head = head.replace(r"^Unnamed: .*", "", regex=True)
+        head.columns = range(head.shape[1])
+        body = pd.concat([head, body], ignore_index=True)
+    return body.apply(lambda c: c.str.strip()).reset_index(drop=True)
+
+
+NBS_URL = "https://www.stats.gov.cn/sj/fbrc/bnxxfb/"
+
+
+def fetch_nbs() -> str:
+    """拉取国家统计局发布日程页面，返回 HTML 文本"""
+    resp = _http_session().get(NBS_URL, timeout=30, allow_redirects=True)
+    resp.raise_for_status()
+    # 编码兜底（避免中文变成乱码导致匹配不到“2026年”）
+    resp.encoding = resp.apparent_encoding or resp.encoding or "utf-8"
+    return resp.text
 
-    write_ics(cal, "08_macro_templates.ics")
 
-def gen_nbs_release_calendar(cal_all: Calendar):
+def gen_nbs_release_calendar(html: str) -> IcsCalendar:
     """
     国家统计局：最新统计信息发布日程（每年更新一次）
     来源：https://www.stats.gov.cn/sj/fbrc/bnxxfb/
-    生成：09_nbs_release.ics，并写入 00_all.ics
+    生成：09_nbs_release.ics（__main__ 负责写盘），并并入 00_all.ics
     """
-    import requests
-    from bs4 import BeautifulSoup
-
-    url = "https://www.stats.gov.cn/sj/fbrc/bnxxfb/"
     cal = make_cal("国家统计局｜重要数据发布日程")
 
-    # 1) 拉取网页
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; github-actions; +https://github.com/)"
-    }
-    resp = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
-    resp.raise_for_status()
-# 编码兜底（避免中文变成乱码导致匹配不到“2026年”）
-    resp.encoding = resp.apparent_encoding or resp.encoding or "utf-8"
-    html = resp.text
+    # 1) 从页面标题/正文中抓年份（例如：2026年国家统计局主要统计信息发布日程表）
+    # 用 lxml 真正解析后取文本，并去掉 <script>/<style>：内联 JS/CSS 里的“XXXX年”不能参与取年份
+    import lxml.html
+    from lxml import etree
 
-    soup = BeautifulSoup(html, "lxml")
+    root = lxml.html.fromstring(html)
+    etree.strip_elements(root, "script", "style", with_tail=False)
+    text_all = "\n".join(root.itertext())
 
-    # 2) 从页面标题/正文中抓年份（例如：2026年国家统计局主要统计信息发布日程表）
-    # 用更稳妥的方式拿到文本与年份
-    text_all = soup.get_text("\n", strip=True)
-
-    # 1) 尝试从全文找所有“XXXX年”，取最大值（通常就是当年日程）
+    # 从全文找所有“XXXX年”，取最大值（通常就是当年日程）
     years = [int(y) for y in re.findall(r"(\d{4})\s*年", text_all)]
     if years:
         year = max(years)
     else:
-        # 2) 如果页面里完全找不到年份（可能被反爬/返回模板页），用当前年份兜底，不让流程挂
+        # 页面里完全找不到年份（可能被反爬/返回模板页），用当前年份兜底，不让流程挂
         year = datetime.now(tz=TZ).year
 
-    # 3) 找到主表格（页面里通常只有一个核心日程表，选包含“序号/内容/1月”的表）
-    tables = soup.find_all("table")
-    target = None
-    for t in tables:
-        t_text = t.get_text(" ", strip=True)
-        if ("序号" in t_text) and ("内容" in t_text) and ("1月" in t_text) and ("12月" in t_text):
-            target = t
+    # 2) pd.read_html 一次把页面里的表格都解析成 DataFrame，
+    #    再选出主表格（包含“序号/内容/1月/12月”的那张）
+    def is_schedule(text: str) -> bool:
+        return ("序号" in text) and ("内容" in text) and ("1月" in text) and ("12月" in text)
+
+    grid = None
+    for t in pd.read_html(io.StringIO(html), flavor="lxml"):
+        g = _table_grid(t)
+        if is_schedule(" ".join(g.to_numpy().ravel())):
+            grid = g
             break
-    if target is None:
+    if grid is None:
         raise RuntimeError("未找到日程表格（页面结构可能变了）")
 
-    # 4) 读表格：逐行取单元格文本
-    rows = []
-    for tr in target.find_all("tr"):
-        cells = [c.get_text(" ", strip=True) for c in tr.find_all(["th", "td"])]
-        if cells:
-            rows.append(cells)
-
-    # 5) 识别表头：找到月份列起点
+    # 3) 识别表头：找到月份列起点
     # 期望表头里包含：序号、内容、1月..12月
     header_idx = None
-    for i, r in enumerate(rows[:10]):  # 表头一般在前几行
-        joined = " ".join(r)
-        if ("序号" in joined) and ("内容" in joined) and ("1月" in joined) and ("12月" in joined):
+    for i, r in enumerate(grid.head(10).to_numpy().tolist()):  # 表头一般在前几行
+        if is_schedule(" ".join(r)):
             header_idx = i
             break
     if header_idx is None:
         raise RuntimeError("未识别到表头行（页面结构可能变了）")
 
-    header = rows[header_idx]
+    header = grid.iloc[header_idx].tolist()
     # 找到“1月”所在列
     try:
         m_start = header.index("1月")
@@ -570,28 +804,8 @@ def gen_nbs_release_calendar(cal_all: Calendar):
 
     # 月份列 1..12
     month_cols = list(range(m_start, m_start + 12))
-
-    # 6) 逐条内容解析：通常是“日期行” + 紧跟一个“时间行”
-    # 日期行：内容列有文字，月份列里是“19/一”“4/三 注5”“……”等
-    # 时间行：内容列为空/很短，月份列里是“10:00”“9:30”重复
-    def parse_day(cell: str) -> int | None:
-        if not cell:
-            return None
-        if "……" in cell or cell in ("-", "—"):
-            return None
-        # 取开头的数字（例如 "4/三 注5" -> 4）
-        mday = re.match(r"^\s*(\d{1,2})\s*/", cell)
-        if not mday:
-            return None
-        return int(mday.group(1))
-
-    def parse_time(cell: str) -> tuple[int, int] | None:
-        if not cell:
-            return None
-        mt = re.search(r"(\d{1,2}):(\d{2})", cell)
-        if not mt:
-            return None
-        return int(mt.group(1)), int(mt.group(2))
+    if month_cols[-1] >= grid.shape[1]:
+        raise RuntimeError("月份列不完整（页面结构可能变了）")
 
     content_col = None
     # 找“内容”列
@@ -602,44 +816,41 @@ def gen_nbs_release_calendar(cal_all: Calendar):
     if content_col is None:
         content_col = 1  # 常见结构：第2列
 
+    # 4) 整列解析月份单元格：通常是“日期行” + 紧跟一个“时间行”
+    # 日期行：内容列有文字，月份列里是“19/一”“4/三 注5”“……”等 -> 取开头的数字
+    # 时间行：内容列为空（或合并单元格被展开成同一内容），月份列里是“10:00”“9:30”重复
+    months = grid[month_cols]
+    days = months.apply(
+        lambda c: pd.to_numeric(c.str.extract(r"^\s*(\d{1,2})\s*/", expand=False), errors="coerce")
+        .where(~c.str.contains("……", regex=False))
+    )
+    times = months.apply(lambda c: c.str.extract(r"(\d{1,2}:\d{2})", expand=False))
+    has_days = days.notna().any(axis=1)
+    has_times = times.notna().any(axis=1)
+    contents = grid[content_col]
+
     # 从表头下一行开始遍历
     i = header_idx + 1
-    while i < len(rows):
-        r = rows[i]
-        # 防止短行
-        if len(r) <= max(month_cols + [content_col]):
-            i += 1
-            continue
-
-        content = r[content_col].strip()
-
-        # 判断是不是“日期行”
-        has_days = any(parse_day(r[c]) is not None for c in month_cols)
-        has_times = any(parse_time(r[c]) is not None for c in month_cols)
+    while i < len(grid):
+        content = contents.iat[i]
 
         # 日期行：有内容 + 有day
-        if content and has_days:
+        if content and has_days.iat[i]:
             # 先收集所有月份的日期
-            day_map: dict[int, int] = {}  # month -> day
-            for mi, col in enumerate(month_cols, start=1):
-                d = parse_day(r[col])
-                if d is not None:
-                    day_map[mi] = d
+            day_map: dict[int, int] = {  # month -> day
+                mi: int(d) for mi, d in enumerate(days.iloc[i], start=1) if pd.notna(d)
+            }
 
             # 看下一行是否是时间行
             time_map: dict[int, tuple[int, int]] = {}
-            if i + 1 < len(rows):
-                r2 = rows[i + 1]
-                if len(r2) > max(month_cols + [content_col]):
-                    content2 = r2[content_col].strip()
-                    has_times2 = any(parse_time(r2[c]) is not None for c in month_cols)
-                    # 时间行：内容空/很短 + 有time
-                    if (not content2 or content2 in ("", " ", "　")) and has_times2:
-                        for mi, col in enumerate(month_cols, start=1):
-                            t = parse_time(r2[col])
-                            if t is not None:
-                                time_map[mi] = t
-                        i += 1  # 吃掉下一行
+            if i + 1 < len(grid):
+                content2 = contents.iat[i + 1]
+                if content2 in ("", content) and has_times.iat[i + 1] and not has_days.iat[i + 1]:
+                    for mi, t in enumerate(times.iloc[i + 1], start=1):
+                        if pd.notna(t):
+                            hh, mm = t.split(":")
+                            time_map[mi] = (int(hh), int(mm))
+                    i += 1  # 吃掉下一行
 
             # 默认时间（如果时间行没给某个月，就尝试用第一个时间作为默认）
             default_time = None
@@ -651,43 +862,63 @@ def gen_nbs_release_calendar(cal_all: Calendar):
                 hhmm = time_map.get(month) or default_time
                 if hhmm:
                     hh, mm = hhmm
-                    dt = TZ.localize(datetime(year, month, day, hh, mm))
+                    dt = datetime(year, month, day, hh, mm, tzinfo=TZ)
                     # timed event：给1小时默认时长（只为日历显示好看）
                     ev = Event()
                     ev.add("summary", f"国家统计局｜{content}")
                     ev.add("dtstart", dt)
                     ev.add("dtend", dt + timedelta(hours=1))
-                    ev.add("uid", f"nbs-{year}-{month:02d}-{day:02d}-{abs(hash(content))}@stats.gov.cn")
-                    ev.add("dtstamp", datetime.now(tz=TZ))
-                    ev.add("description", f"来源：{url}\n注：发布日期为初步计划，可能调整。")
+                    ev.add("uid", f"nbs-{year}-{month:02d}-{day:02d}-{_uid_hash(content)}@stats.gov.cn")
+                    ev.add("dtstamp", _RUN_DTSTAMP)
+                    ev.add("description", f"来源：{NBS_URL}\n注：发布日期为初步计划，可能调整。")
                     cal.add_component(ev)
-                    cal_all.add_component(ev)
                 else:
                     # 如果页面没给时间，就做全天事件
-                    add_all_day_event([cal, cal_all], date(year, month, day), f"国家统计局｜{content}",
-                                      description=f"来源：{url}\n注：发布日期为初步计划，可能调整。",
-                                      uid=f"nbs-{year}-{month:02d}-{day:02d}-{abs(hash(content))}@stats.gov.cn")
+                    add_all_day_event(cal, date(year, month, day), f"国家统计局｜{content}",
+                                      description=f"来源：{NBS_URL}\n注：发布日期为初步计划，可能调整。",
+                                      uid=f"nbs-{year}-{month:02d}-{day:02d}-{_uid_hash(content)}@stats.gov.cn")
 
         i += 1
 
-    write_ics(cal, "09_nbs_release.ics")
+    return cal
+
+# AkShare 数据源的拉取函数（参数为 akshare 模块）：互不依赖，__main__ 里和国家统计局页面一起并发执行
+AK_FETCHERS = {
+    "ipo": fetch_ipo,
+    "unlock": fetch_unlock,
+    "earnings": fetch_earnings,
+    "dividend": fetch_dividend,
+    "macro": fetch_macro,
+}
 
 if __name__ == "__main__":
-    # 总合集（日历订阅只需要这一个链接）
-    cal_all = make_cal("中国市场投资日历（全量）")
-
-    gen_ipo_calendar(cal_all)
-    gen_unlock_calendar(cal_all)
-    gen_earnings_calendar(cal_all)
-    gen_dividend_calendar(cal_all)
-    gen_index_rebalance_calendar(cal_all)
-    gen_macro_calendar(cal_all)
-    # gen_cn_report_deadlines_template(cal_all)
-    # gen_cn_macro_template(cal_all)
-    try:
-        gen_nbs_release_calendar(cal_all)
-    except Exception as e:
-        print("NBS calendar skipped due to error:", repr(e))
+    # akshare 很重，只在这里导入一次，再交给各个拉取函数
+    import akshare as ak
+
+    # (日历, 文件名)：生成器只负责填日历并返回，写盘统一在这里做
+    outputs: list[tuple[IcsCalendar, str]] = []
 
-    # 输出总合集 + 分主题
-    write_ics(cal_all, "00_all.ics")
+    try:
+        # 网络拉取是整个脚本最慢的部分：先并发拉取，生成日历仍按顺序单线程
+        with ThreadPoolExecutor(max_workers=len(AK_FETCHERS) + 1) as ex:
+            futures = {name: ex.submit(fn, ak) for name, fn in AK_FETCHERS.items()}
+            futures["nbs"] = ex.submit(fetch_nbs)
+
+            outputs.append((gen_ipo_calendar(futures["ipo"].result()), "01_ipo.ics"))
+            outputs.append((gen_unlock_calendar(futures["unlock"].result()), "02_unlock.ics"))
+            outputs.append((gen_earnings_calendar(futures["earnings"].result()), "03_earnings.ics"))
+            outputs.append((gen_dividend_calendar(futures["dividend"].result()), "04_dividend.ics"))
+            outputs.append((gen_index_rebalance_calendar(), "05_index_rebalance_rules.ics"))
+            outputs.append((gen_macro_calendar(futures["macro"].result()), "06_macro.ics"))
+            # outputs.append((gen_cn_report_deadlines_template(), "07_report_templates.ics"))
+            # outputs.append((gen_cn_macro_template(), "08_macro_templates.ics"))
+            try:
+                outputs.append((gen_nbs_release_calendar(futures["nbs"].result()), "09_nbs_release.ics"))
+            except Exception as e:
+                print("NBS calendar skipped due to error:", repr(e))
+
+        # 总合集（日历订阅只需要这一个链接）：拼接各分主题日历
+        outputs.append((merge_cals("中国市场投资日历（全量）", [cal for cal, _ in outputs]), "00_all.ics"))
+    finally:
+        # 某个生成器抛错时，前面已经生成好的分主题日历照样写盘
+        flush_ics(outputs)